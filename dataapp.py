@@ -1,8 +1,22 @@
 import streamlit as st
+import altair as alt
 import pandas as pd
-import matplotlib.pyplot as plt
-from pathlib import Path
-import base64
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+import csv
+import hashlib
+import io
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+DELIMITER_SAMPLE_BYTES = 65536
+PLOT_MAX_POINTS = 2000
+COUNTS_TOP_K = 50
+
+# st.fragment is still st.experimental_fragment in the pinned Streamlit release.
+fragment = getattr(st, 'fragment', None) or st.experimental_fragment
 
 st.markdown(f"""
     <style>
@@ -44,15 +58,44 @@ st.markdown(f"""
 page = st.sidebar.radio("Navigation", ["App", "User Manual"])
 
 if page == "App":
-    @st.cache_data
-    def load_data(uploaded_file):
+    def file_fingerprint(uploaded_file):
+        # Computed once per run and passed to the cached helpers as their key, so re-uploading
+        # the same bytes under another name reuses the parsed frame, and the frames themselves
+        # (passed as underscore arguments) are never hashed.
+        with uploaded_file.getbuffer() as buffer:
+            return hashlib.blake2b(buffer, digest_size=16).hexdigest()
+
+    def sniff_delimiter(uploaded_file, default=';'):
+        uploaded_file.seek(0)
+        sample = uploaded_file.read(DELIMITER_SAMPLE_BYTES).decode('utf-8', errors='ignore')
+        uploaded_file.seek(0)
+        try:
+            return csv.Sniffer().sniff(sample, delimiters=';,\t|').delimiter
+        except csv.Error:
+            return default
+
+    @st.cache_data(max_entries=4)
+    def load_data(file_key, _uploaded_file):
+        uploaded_file = _uploaded_file
         dtype_spec = {
             'Plant (WERKS)': str,
             'G/L Account (SAKNR)': str,
             'Company Code (BUKRS)': str
         }
         try:
-            df = pd.read_csv(uploaded_file, delimiter=';', dtype=dtype_spec, low_memory=False)
+            delimiter = sniff_delimiter(uploaded_file)
+            # Read through pyarrow directly: pandas' pyarrow engine casts dtypes after
+            # type inference, which strips the leading zeros from the code columns.
+            table = pacsv.read_csv(
+                uploaded_file,
+                parse_options=pacsv.ParseOptions(delimiter=delimiter),
+                convert_options=pacsv.ConvertOptions(
+                    column_types={col: pa.string() for col in dtype_spec},
+                    strings_can_be_null=True
+                )
+            )
+            # Keep the columns Arrow-backed instead of converting them to NumPy/object arrays.
+            df = table.to_pandas(types_mapper=pd.ArrowDtype)
             df = df.loc[:, (df != 0).any(axis=0)]
             df = df.dropna(how='all', axis=1)
         except Exception as e:
@@ -60,79 +103,171 @@ if page == "App":
             return pd.DataFrame()
         return df
 
-    @st.cache_data
-    def filter_data(df, filter_conditions):
+    @st.cache_data(max_entries=32)
+    def column_as_category(file_key, column, _df):
+        return _df[column].astype('category')
+
+    @st.cache_data(max_entries=32)
+    def unique_values(file_key, column, _df):
+        return _df[column].unique().tolist()
+
+    @st.cache_data(max_entries=4)
+    def filter_data(file_key, filter_conditions, _df):
+        df = _df
         if not df.empty:
+            masks = []
             for column, values in filter_conditions.items():
-                df = df[df[column].astype(str).isin(values)]
+                if df[column].dtype.kind in 'OU':
+                    categorical = column_as_category(file_key, column, df)
+                    selected = categorical.cat.categories.get_indexer([value for value in values if not pd.isna(value)])
+                    selected = selected[selected >= 0]
+                    if pd.isna(values).any():
+                        selected = np.append(selected, -1)
+                    masks.append(np.isin(categorical.cat.codes.to_numpy(), selected))
+                else:
+                    # The options come from the column itself, so match in its native dtype.
+                    selected = pd.Series([value for value in values if not pd.isna(value)], dtype=df[column].dtype)
+                    mask = df[column].isin(selected).to_numpy()
+                    if pd.isna(values).any():
+                        mask |= df[column].isna().to_numpy()
+                    masks.append(mask)
+            if masks:
+                df = df.loc[np.logical_and.reduce(masks)]
             if df.empty:
                 st.warning("No data found for the given filter conditions.")
             return df
         return pd.DataFrame()
 
+    def get_axes():
+        if 'figure' not in st.session_state:
+            st.session_state['figure'] = Figure(figsize=(10, 5))
+        fig = st.session_state['figure']
+        fig.clear()
+        return fig, fig.add_subplot(111)
+
+    # data_key is (file fingerprint, filter conditions): it identifies the filtered frame.
+    @st.cache_data(max_entries=32)
+    def count_values(data_key, column, _df, top_k=COUNTS_TOP_K):
+        return _df[column].value_counts(sort=False).nlargest(top_k)
+
+    @st.cache_data(max_entries=32)
+    def parse_dates(data_key, column, _df):
+        return pd.to_datetime(_df[column], errors='coerce', cache=True)
+
+    @st.cache_data(max_entries=32)
+    def monthly_mean(data_key, date_col, value_col, _series):
+        return _series.resample('ME').mean()
+
+    @st.cache_data(max_entries=32)
+    def correlation(data_key, _numeric_df):
+        numeric_df = _numeric_df
+        values = numeric_df.to_numpy(dtype=np.float64, na_value=np.nan)
+        if np.isnan(values).any():
+            # Missing values need pandas' pairwise-complete correlation.
+            return numeric_df.corr()
+        # Centre in float64 before downcasting: large offsets with a small spread (IDs, epoch
+        # values) would otherwise lose the spread to float32 rounding.
+        values = (values - values.mean(axis=0)).astype(np.float32)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values /= values.std(axis=0)
+            corr = (values.T @ values) / len(values)
+        return pd.DataFrame(corr, index=numeric_df.columns, columns=numeric_df.columns)
+
+    @st.cache_data(max_entries=1)
+    def csv_bytes(data_key, _df):
+        buffer = io.BytesIO()
+        pacsv.write_csv(pa.Table.from_pandas(_df, preserve_index=False), buffer)
+        return buffer.getvalue()
+
+    def lttb_indices(x, y, n_out):
+        # Largest-Triangle-Three-Buckets: keep the first and last points and, from each of the
+        # n_out - 2 buckets in between, the point spanning the largest triangle with the point
+        # kept from the previous bucket and the mean of the next one. x must be sorted.
+        n = len(x)
+        edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+        keep = np.empty(n_out, dtype=np.int64)
+        keep[0], keep[-1] = 0, n - 1
+        a = 0
+        for i in range(n_out - 2):
+            start, end = edges[i], edges[i + 1]
+            next_end = edges[i + 2] if i + 2 < len(edges) else n
+            next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+            area = np.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+            a = start + int(area.argmax())
+            keep[i + 1] = a
+        return keep
+
     def plot_data(df, x_col, y_col, plot_type='line'):
         if not df.empty:
-            try:
-                df[x_col] = pd.to_numeric(df[x_col], errors='ignore')
-                df[y_col] = pd.to_numeric(df[y_col], errors='ignore')
-            except ValueError:
-                pass
-            
-            plt.figure(figsize=(10, 5))
+            x_values, y_values = df[x_col], df[y_col]
             if plot_type == 'line':
-                if pd.api.types.is_numeric_dtype(df[x_col]) and pd.api.types.is_numeric_dtype(df[y_col]):
-                    plt.plot(df[x_col], df[y_col], marker='o')
+                if pd.api.types.is_numeric_dtype(x_values) and pd.api.types.is_numeric_dtype(y_values):
+                    chart_data = pd.DataFrame({'x': x_values.to_numpy(), 'y': y_values.to_numpy()})
+                    chart_data = chart_data.dropna().sort_values('x', kind='stable')
+                    if len(chart_data) > 2 * PLOT_MAX_POINTS:
+                        keep = lttb_indices(
+                            chart_data['x'].to_numpy(dtype=float),
+                            chart_data['y'].to_numpy(dtype=float),
+                            PLOT_MAX_POINTS
+                        )
+                        chart_data = chart_data.iloc[keep]
+                    chart = alt.Chart(chart_data).mark_line(point=True).encode(
+                        x=alt.X('x:Q', title=x_col),
+                        y=alt.Y('y:Q', title=y_col)
+                    )
                 else:
                     st.warning("Line plot requires numeric data for both axes.")
                     return
             elif plot_type == 'bar':
-                if pd.api.types.is_numeric_dtype(df[y_col]):
-                    df.groupby(x_col)[y_col].sum().plot(kind='bar')
+                if pd.api.types.is_numeric_dtype(y_values):
+                    codes, uniques = pd.factorize(x_values, sort=True)
+                    weights = y_values.to_numpy(dtype=np.float64, na_value=0.0)
+                    grouped = codes >= 0
+                    sums = np.bincount(codes[grouped], weights=weights[grouped], minlength=len(uniques))
+                    bar_data = pd.Series(sums, index=uniques)
                 else:
-                    df[x_col].value_counts().plot(kind='bar')
-            plt.title(f'{y_col} over {x_col}')
-            plt.xlabel(x_col)
-            plt.ylabel(y_col)
-            plt.grid(True)
-            st.pyplot(plt)
+                    bar_data = x_values.value_counts()
+                chart_data = pd.DataFrame({'x': bar_data.index, 'y': bar_data.to_numpy()})
+                chart = alt.Chart(chart_data).mark_bar().encode(
+                    x=alt.X('x:N', title=x_col, sort=None),
+                    y=alt.Y('y:Q', title=y_col)
+                )
+            st.altair_chart(chart.properties(title=f'{y_col} over {x_col}'), use_container_width=True)
         else:
             st.warning("Filtered data is empty, no plot to display.")
 
-    def plot_counts(df, count_col):
+    def plot_counts(df, count_col, data_key):
         if not df.empty:
-            count_data = df[count_col].value_counts()
-            plt.figure(figsize=(10, 5))
-            count_data.plot(kind='bar')
-            plt.title(f'Count of different values in {count_col}')
-            plt.xlabel(count_col)
-            plt.ylabel('Count')
-            plt.grid(True)
-            st.pyplot(plt)
+            count_data = count_values(data_key, count_col, df)
+            chart_data = pd.DataFrame({'value': count_data.index, 'count': count_data.to_numpy()})
+            chart = alt.Chart(chart_data).mark_bar().encode(
+                x=alt.X('value:N', title=count_col, sort=None),
+                y=alt.Y('count:Q', title='Count')
+            ).properties(title=f'Count of different values in {count_col}')
+            st.altair_chart(chart, use_container_width=True)
         else:
             st.warning("Data is empty, no plot to display.")
 
-    def plot_trend(df, date_col, value_col):
+    def plot_trend(df, date_col, value_col, data_key):
         if not df.empty:
-            df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-            if df[date_col].isnull().all():
+            dates = parse_dates(data_key, date_col, df)
+            if dates.isnull().all():
                 st.warning("Date parsing failed. Please select a valid date column.")
                 return
 
-            df[value_col] = pd.to_numeric(df[value_col], errors='coerce')
+            values = pd.to_numeric(df[value_col], errors='coerce')
 
-            if df[value_col].isnull().all():
+            if values.isnull().all():
                 st.warning("Value column cannot be converted to numeric. Please select a different value column.")
                 return
 
-            df = df.set_index(date_col)
-            trend_data = df[value_col].resample('M').mean()
-            plt.figure(figsize=(10, 5))
-            trend_data.plot()
-            plt.title(f'Trend of {value_col} over Time')
-            plt.xlabel('Time')
-            plt.ylabel(value_col)
-            plt.grid(True)
-            st.pyplot(plt)
+            trend_data = monthly_mean(data_key, date_col, value_col, values.set_axis(dates))
+            chart_data = pd.DataFrame({'time': trend_data.index, 'value': trend_data.to_numpy()})
+            chart = alt.Chart(chart_data).mark_line().encode(
+                x=alt.X('time:T', title='Time'),
+                y=alt.Y('value:Q', title=value_col)
+            ).properties(title=f'Trend of {value_col} over Time')
+            st.altair_chart(chart, use_container_width=True)
         else:
             st.warning("Filtered data is empty, no trend to display.")
 
@@ -141,96 +276,119 @@ if page == "App":
         desc_stats = df[column].describe()
         st.write(desc_stats)
         
-        plt.figure(figsize=(10, 5))
-        desc_stats.plot(kind='bar')
-        plt.title(f'Descriptive Statistics for {column}')
-        plt.xlabel('Statistics')
-        plt.ylabel('Values')
-        plt.grid(True)
-        st.pyplot(plt)
-
-    def correlation_matrix(df):
+        fig, ax = get_axes()
+        desc_stats.plot(kind='bar', ax=ax)
+        ax.set_title(f'Descriptive Statistics for {column}')
+        ax.set_xlabel('Statistics')
+        ax.set_ylabel('Values')
+        ax.grid(True)
+        st.pyplot(fig)
+
+    def correlation_matrix(df, data_key):
         st.write("Correlation Matrix:")
-        numeric_df = df.select_dtypes(include=[float, int])
+        numeric_df = df.select_dtypes(include='number')
         if numeric_df.empty:
             st.warning("No numeric columns available for correlation matrix.")
             return
-        corr = numeric_df.corr()
+        corr = correlation(data_key, numeric_df)
         st.write(corr)
-        plt.figure(figsize=(10, 5))
-        plt.matshow(corr, cmap='coolwarm')
-        plt.colorbar()
-        st.pyplot(plt)
+        fig, ax = get_axes()
+        image = ax.imshow(corr, cmap='coolwarm')
+        fig.colorbar(image)
+        st.pyplot(fig)
 
     def distribution_plot(df, column):
         st.write(f"Distribution of {column}:")
-        plt.figure(figsize=(10, 5))
-        df[column].hist(bins=30)
-        plt.title(f'Distribution of {column}')
-        plt.xlabel(column)
-        plt.ylabel('Frequency')
-        st.pyplot(plt)
+        if not pd.api.types.is_numeric_dtype(df[column]):
+            st.warning("Distribution plot requires a numeric column.")
+            return
+        values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        counts, edges = np.histogram(values[~np.isnan(values)], bins=30)
+        fig, ax = get_axes()
+        ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge')
+        ax.grid(True)
+        ax.set_title(f'Distribution of {column}')
+        ax.set_xlabel(column)
+        ax.set_ylabel('Frequency')
+        st.pyplot(fig)
+
+    # Each section is a fragment, so its widgets rerun only that section instead of the whole script.
+    @fragment
+    def plot_section(df):
+        col1, col2 = st.columns(2)
+        with col1:
+            x_col = st.selectbox('Select X-axis Column', df.columns)
+        with col2:
+            y_col = st.selectbox('Select Y-axis Column', df.columns)
+
+        plot_type = st.selectbox('Select Plot Type', ['line', 'bar'])
+        if st.button('Generate Plot'):
+            plot_data(df, x_col, y_col, plot_type)
+
+    @fragment
+    def export_section(df, data_key):
+        # Serialize only on request, not on every render of the section.
+        if st.button('Prepare Export'):
+            st.download_button('Export Filtered Data', data=csv_bytes(data_key, df), file_name='filtered_data.csv', mime='text/csv')
+
+    @fragment
+    def counts_section(df, data_key):
+        count_col = st.selectbox("Select Column to Show Value Counts", df.columns)
+        if st.button('Show Counts'):
+            st.write(count_values(data_key, count_col, df))
+            plot_counts(df, count_col, data_key)
+
+    @fragment
+    def trend_section(df, data_key):
+        date_col = st.selectbox('Select Date Column for Trend Analysis', df.columns)
+        value_col = st.selectbox('Select Value Column for Trend Analysis', df.columns)
+        if st.button('Show Trend'):
+            plot_trend(df, date_col, value_col, data_key)
+
+    @fragment
+    def stats_section(df, data_key):
+        desc_col = st.selectbox('Select Column for Descriptive Statistics', df.columns)
+        if st.button('Show Descriptive Statistics'):
+            descriptive_statistics(df, desc_col)
+
+        if st.button('Show Correlation Matrix'):
+            correlation_matrix(df, data_key)
+
+        distribution_col = st.selectbox('Select Column for Distribution Plot', df.columns)
+        if st.button('Show Distribution Plot'):
+            distribution_plot(df, distribution_col)
 
     uploaded_file = st.file_uploader("Choose a CSV file", type="csv", key="file_uploader")
     if uploaded_file is not None:
-        df = load_data(uploaded_file)
+        file_key = file_fingerprint(uploaded_file)
+        df = load_data(file_key, uploaded_file)
         if not df.empty:
             st.write("Data Preview:")
             st.dataframe(df.head())
 
             filter_conditions = {}
-            key_index = 0
-            while True:
-                filter_column = st.selectbox("Select Column to Filter By", [''] + list(df.columns), key=f'filter_column_{key_index}')
-                if filter_column:
-                    filter_values = df[filter_column].unique().tolist()
-                    selected_values = st.multiselect(f"Select Values for {filter_column}", filter_values, key=f'selected_values_{key_index}')
-                    if selected_values:
-                        filter_conditions[filter_column] = selected_values
-                key_index += 1
-                add_more = st.radio("Do you want to filter by another column?", ("Yes", "No"), index=1, key=f'add_more_{key_index}')
-                if add_more == "No":
-                    break
-
-            filtered_df = filter_data(df, filter_conditions)
+            filter_columns = st.multiselect("Select Columns to Filter By", list(df.columns), key='filter_columns')
+            if filter_columns:
+                # Value selections inside the form only trigger a rerun when the form is submitted.
+                with st.form("filters"):
+                    for filter_column in filter_columns:
+                        filter_values = unique_values(file_key, filter_column, df)
+                        selected_values = st.multiselect(f"Select Values for {filter_column}", filter_values, key=f'selected_values_{filter_column}')
+                        if selected_values:
+                            filter_conditions[filter_column] = selected_values
+                    st.form_submit_button("Apply Filters")
+
+            filtered_df = filter_data(file_key, filter_conditions, df)
+            data_key = (file_key, filter_conditions)
             if not filtered_df.empty:
                 st.write("Filtered Data Preview:")
                 st.dataframe(filtered_df.head())
 
-                col1, col2 = st.columns(2)
-                with col1:
-                    x_col = st.selectbox('Select X-axis Column', filtered_df.columns)
-                with col2:
-                    y_col = st.selectbox('Select Y-axis Column', filtered_df.columns)
-
-                plot_type = st.selectbox('Select Plot Type', ['line', 'bar'])
-                if st.button('Generate Plot'):
-                    plot_data(filtered_df, x_col, y_col, plot_type)
-
-                if st.button('Export Filtered Data'):
-                    filtered_df.to_csv('filtered_data.csv', index=False)
-                    st.success('Filtered data has been exported as filtered_data.csv.')
-
-                count_col = st.selectbox("Select Column to Show Value Counts", filtered_df.columns)
-                if st.button('Show Counts'):
-                    st.write(filtered_df[count_col].value_counts())
-                    plot_counts(filtered_df, count_col)
-
-                date_col = st.selectbox('Select Date Column for Trend Analysis', filtered_df.columns)
-                value_col = st.selectbox('Select Value Column for Trend Analysis', filtered_df.columns)
-                if st.button('Show Trend'):
-                    plot_trend(filtered_df, date_col, value_col)
-                
-                desc_col = st.selectbox('Select Column for Descriptive Statistics', filtered_df.columns)
-                if st.button('Show Descriptive Statistics'):
-                    descriptive_statistics(filtered_df, desc_col)
-
-                if st.button('Show Correlation Matrix'):
-                    correlation_matrix(filtered_df)
-
-                distribution_col = st.selectbox('Select Column for Distribution Plot', filtered_df.columns)
-                if st.button('Show Distribution Plot'):
-                    distribution_plot(filtered_df, distribution_col)
+                plot_section(filtered_df)
+                export_section(filtered_df, data_key)
+                counts_section(filtered_df, data_key)
+                trend_section(filtered_df, data_key)
+                stats_section(filtered_df, data_key)
     else:
         st.write("Please upload a CSV file to get started.")
 
@@ -248,13 +406,13 @@ elif page == "User Manual":
             <h3>Overview</h3>
             <p>This web app allows you to upload a CSV file, filter the data, visualize it in various ways, and export the filtered data.</p>
             <h3>Uploading Data</h3>
-            <p><b>Upload CSV File:</b> Click the "Choose a CSV file" button to upload your data file. The app supports CSV files with a semi-colon (;) delimiter.</p>
+            <p><b>Upload CSV File:</b> Click the "Choose a CSV file" button to upload your data file. The delimiter (semi-colon, comma, tab or pipe) is detected automatically; semi-colon is assumed when it cannot be detected.</p>
             <h3>Data Preview</h3>
             <p><b>Data Preview:</b> Once the file is uploaded, you will see a preview of the first few rows of your data.</p>
             <h3>Filtering Data</h3>
-            <p><b>Select Column to Filter By:</b> Choose a column from the dropdown to filter the data by specific values.</p>
-            <p><b>Select Values for Column:</b> Choose the values you want to include from the selected column.</p>
-            <p><b>Add More Filters:</b> Click the "Yes" radio button to add more filters, otherwise select "No" to proceed.</p>
+            <p><b>Select Columns to Filter By:</b> Choose one or more columns from the dropdown to filter the data by specific values.</p>
+            <p><b>Select Values for Column:</b> Choose the values you want to include from each selected column.</p>
+            <p><b>Apply Filters:</b> Click this button to filter the data by the selected values. Changes to the selected values take effect only once this button is clicked.</p>
             <h3>Data Visualization</h3>
             <p><b>Generate Plot:</b></p>
             <ul>
@@ -263,11 +421,11 @@ elif page == "User Manual":
                 <li><b>Select Plot Type:</b> Choose between 'line' or 'bar' plot types. A line plot is used for showing trends over time or continuous data, while a bar plot is used for comparing discrete categories.</li>
                 <li><b>Generate Plot:</b> Click this button to create the plot based on the selected columns and plot type.</li>
             </ul>
-            <p><b>Export Filtered Data:</b> Click this button to export the filtered data as a CSV file.</p>
+            <p><b>Prepare Export:</b> Click this button to prepare the filtered data for download, then click <b>Export Filtered Data</b> to download it as a CSV file named filtered_data.csv.</p>
             <p><b>Show Counts:</b></p>
             <ul>
                 <li><b>Select Column:</b> Choose a column to display the count of its unique values. This shows how many times each unique value appears in the selected column.</li>
-                <li><b>Show Counts:</b> Click this button to display the value counts and generate a bar plot of these counts.</li>
+                <li><b>Show Counts:</b> Click this button to display the counts of the {COUNTS_TOP_K} most frequent values and generate a bar plot of these counts.</li>
             </ul>
             <p><b>Show Trend:</b></p>
             <ul>